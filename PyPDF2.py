@@ -9,40 +9,40 @@
 # They have moved to using snake case naming convention
 
 # 2. Use PyPDF2 to read text from a PDF:
-   import PyPDF2
+import PyPDF2
+
+def read_pdf(file_path):
+    with open(file_path, 'rb') as file:
+        # Create a PDF reader object
+        pdf_reader = PyPDF2.PdfReader(file)
+        # But from the documentation a pdf reader was created by just passing in the file path without creating a file object like this: 
+        pdf_reader = PyPDF2.PdfReader(file_path)  # Anyone that works works
 
-   def read_pdf(file_path):
-       with open(file_path, 'rb') as file:
-           # Create a PDF reader object
-           pdf_reader = PyPDF2.PdfReader(file)
-           # But from the documentation a pdf reader was created by just passing in the file path without creating a file object like this: 
-           pdf_reader = PyPDF2.PdfReader(file_path)  # Anyone that works works
+        # Get the number of pages in the PDF
+        num_pages = len(pdf_reader.pages)
 
-           # Get the number of pages in the PDF
-           num_pages = len(pdf_reader.pages)
+        # Initialize an empty string to store the text
+        text = ''
 
-           # Initialize an empty string to store the text
-           text = ''
+        # Iterate through all pages and extract text
+        for page_num in range(num_pages):
+            # Get the page
+            page = pdf_reader.pages[page_num] # pdf_reader.pages is an object like a list and so the page indexing starts from 0.
+                                              # Therefore the first page is pdf_reader.pages[0]
 
-           # Iterate through all pages and extract text
-           for page_num in range(num_pages):
-               # Get the page
-               page = pdf_reader.pages[page_num] # pdf_reader.pages is an object like a list and so the page indexing starts from 0.
-                                                 # Therefore the first page is pdf_reader.pages[0]
+            # Extract text from the page
+            text += page.extract_text()
 
-               # Extract text from the page
-               text += page.extract_text()
+        return text
 
-           return text
+# Replace 'your_file.pdf' with the path to your PDF file
+pdf_file_path = 'your_file.pdf'
+extracted_text = read_pdf(pdf_file_path)
 
-   # Replace 'your_file.pdf' with the path to your PDF file
-   pdf_file_path = 'your_file.pdf'
-   extracted_text = read_pdf(pdf_file_path)
+print(extracted_text)
 
-   print(extracted_text)
-   
 
-   # Replace 'your_file.pdf' with the path to your actual PDF file.
+# Replace 'your_file.pdf' with the path to your actual PDF file.
 
 # Note: PyPDF2 may not work well with all types of PDFs, especially those with complex structures or encrypted content.
 # If you encounter issues, you might want to explore other libraries like PyMuPDF (MuPDF) or PyPDFium, which can handle a wider range of PDFs.
@@ -103,10 +103,11 @@ def read_pdf_line_by_line(file_path):
             page = pdf_reader.pages[page_num]
 
             # Extract text from the page and split it into lines
-            lines += page.extract_text().split('\n')
-            # python (or I think the new versions) support a method called splitlines() on strings
-            # so you could do this instead
             lines += page.extract_text().splitlines()
+            # split('\n') also works, but the text of a page usually ends with a newline and split('\n') then gives
+            # an empty line after every page (splitlines() doesn't). PdfLines and PdfTextCache below use splitlines() too
+            # (only use one of them, otherwise every line is added twice)
+            # lines += page.extract_text().split('\n')
             
 
         return lines
@@ -119,8 +120,512 @@ extracted_lines = read_pdf_line_by_line(pdf_file_path)
 for line in extracted_lines:
     print(line)
 
-# This code extracts the text from each page, splits it into lines using the `split('\n')` method, and then appends the lines to the `lines` list.
+# This code extracts the text from each page, splits it into lines using the `splitlines()` method, and then appends the lines to the `lines` list.
 # The result is a list where each element represents a line of text from the PDF.
 
 # Keep in mind that the quality of the text extraction can vary depending on the PDF file's content and structure.
 # If the PDF has complex formatting, the extracted text may not be perfectly organized into lines.
+
+
+### Streaming the pages instead of building one big string
+
+# `text += page.extract_text()` in read_pdf copies everything collected so far every time a page is added,
+# and the whole document has to sit in memory before you can look at the first page.
+# For very large PDFs (thousands of pages) it is better to use a generator that hands out one page at a time.
+
+import PyPDF2
+
+def iter_pdf_pages(file_path):
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+
+        # pdf_reader.pages can be iterated directly, no need for range(num_pages)
+        for page in pdf_reader.pages:
+            # yield makes this function a generator, so a page is only extracted when the caller asks for it
+            yield page.extract_text()
+
+# The file stays open until the loop has finished (or the generator is closed)
+for page_text in iter_pdf_pages('your_file.pdf'):
+    print(page_text)
+
+# If you still need one string, join the pages. ''.join() works out the final size first and copies each page once
+extracted_text = ''.join(iter_pdf_pages('your_file.pdf'))
+
+
+### Extracting pages in parallel
+
+# extract_text() is CPU bound, so threads won't help much because of the GIL. A process pool can use every core.
+# A PdfReader can't be sent to another process, so every worker opens the file itself. Opening is not free:
+# the first pdf_reader.pages[...] walks the whole page tree, which took about 310 ms on the 5000 page fixture
+# (extracting 50 pages took about 43 ms). So it is done once per worker by the pool's initializer,
+# and the reader is kept in a global of the worker process for all the ranges that worker gets.
+# The main process yields the ranges in the same order they were submitted.
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+_worker_reader = None
+
+def _open_in_worker(file_path):
+    # Runs once in every worker process when it starts. The file stays open as long as the process lives
+    global _worker_reader
+    _worker_reader = PyPDF2.PdfReader(open(file_path, 'rb'))
+
+def _extract_page_range(start, stop):
+    # This runs inside a worker process
+    return [_worker_reader.pages[page_num].extract_text() for page_num in range(start, stop)]
+
+def iter_pdf_pages_parallel(file_path, workers=4, pages_per_task=50):
+    with open(file_path, 'rb') as file:
+        num_pages = len(PyPDF2.PdfReader(file).pages)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open_in_worker, initargs=(file_path,)) as executor:
+        # Only keep a couple of ranges per worker in flight, otherwise a slow consumer would let
+        # every page of the document pile up in memory (executor.map submits everything at once)
+        pending = deque()
+        for start in range(0, num_pages, pages_per_task):
+            stop = min(start + pages_per_task, num_pages)
+            pending.append(executor.submit(_extract_page_range, start, stop))
+            if len(pending) >= workers * 2:
+                # popleft() gives the oldest range, so the pages come out in the original order
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+# Process pools start new python processes which import this file again,
+# so code that creates the pool must be protected with the __main__ check
+if __name__ == '__main__':
+    for page_text in iter_pdf_pages_parallel('your_file.pdf', workers=4):
+        print(page_text)
+
+
+### Performance
+
+# To compare the approaches we need a big PDF. PyPDF2 can't easily write text onto pages,
+# but a PDF is just text objects and a table of byte offsets (the xref table) so we can write a simple one ourselves.
+
+def make_test_pdf(file_path, num_pages, lines_per_page=40):
+    # Object 1 is the catalog, 2 is the page tree, 3 is the font; every page then takes two objects (page + content)
+    objects = []
+    page_ids = [4 + 2 * i for i in range(num_pages)]
+    objects.append(b'<< /Type /Catalog /Pages 2 0 R >>')
+    kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids)
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {num_pages} >>'.encode())
+    objects.append(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    for page_num, page_id in enumerate(page_ids):
+        lines = [f'({page_num + 1}.{line_num} The quick brown fox jumps over the lazy dog) Tj T*' for line_num in range(lines_per_page)]
+        stream = ('BT /F1 10 Tf 12 TL 50 780 Td ' + ' '.join(lines) + ' ET').encode()
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>'.encode())
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+
+    with open(file_path, 'wb') as file:
+        file.write(b'%PDF-1.4\n')
+        offsets = []
+        for obj_num, body in enumerate(objects, start=1):
+            offsets.append(file.tell())
+            file.write(b'%d 0 obj\n' % obj_num + body + b'\nendobj\n')
+        xref_offset = file.tell()
+        file.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+        for offset in offsets:
+            file.write(b'%010d 00000 n \n' % offset)
+        file.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref_offset))
+
+if __name__ == '__main__':
+    import time
+
+    make_test_pdf('fixture_5000.pdf', 5000)
+
+    start_time = time.perf_counter()
+    read_pdf('fixture_5000.pdf')
+    elapsed = time.perf_counter() - start_time
+    print(f"read_pdf: {5000 / elapsed:.0f} pages/second")
+
+    start_time = time.perf_counter()
+    for page_text in iter_pdf_pages('fixture_5000.pdf'):
+        pass
+    elapsed = time.perf_counter() - start_time
+    print(f"iter_pdf_pages: {5000 / elapsed:.0f} pages/second")
+
+    for workers in (2, 4, 8):
+        start_time = time.perf_counter()
+        for page_text in iter_pdf_pages_parallel('fixture_5000.pdf', workers=workers):
+            pass
+        elapsed = time.perf_counter() - start_time
+        print(f"iter_pdf_pages_parallel ({workers} workers): {5000 / elapsed:.0f} pages/second")
+
+# On the 5000 page fixture read_pdf did 570-600 pages/second and iter_pdf_pages 530-690 (two runs), so they are about as fast
+# (the real work is extract_text()). The win of iter_pdf_pages is that memory stays at one page.
+# iter_pdf_pages_parallel was measured on a machine with 1 core, next to iter_pdf_pages at 1298 pages/second:
+# 1 worker 1121, 2 workers 1090, 4 workers 961, 8 workers 724 pages/second. One worker is a bit slower than no pool because
+# the text is pickled over to the main process, and every extra worker walks the page tree once more (about 310 ms).
+# With one core nothing runs side by side, so the speedup needs more cores: each one can extract pages at about the 1 worker rate.
+# (When every 50 page range opened its own PdfReader, 2 workers only did about 127 pages/second.)
+
+
+### Caching the extracted text on disk
+
+# Parsing a PDF is the slow part, so if the same documents are read again and again it pays to keep the text around.
+# The cache below is keyed by a hash of the file's bytes (plus the PyPDF2 version, since a new version may extract text differently),
+# so a renamed or copied file still hits the cache, and an edited file gets a new key.
+
+# Every document is stored in one file:
+#   - 4 bytes: the number of pages
+#   - 8 bytes per page: where that page's data ends
+#   - the text of every page, each compressed separately with zlib
+# Because pages are compressed separately, one page can be read back without decompressing the others.
+# To stay under max_bytes the cache remembers the size of every file it has, least recently used first, and the total.
+# The folder is only listed when the cache is created, so storing a document doesn't have to look at every other file.
+
+import hashlib
+import os
+import struct
+import zlib
+from collections import OrderedDict
+
+class PdfTextCache:
+    def __init__(self, cache_dir='.pdf_text_cache', max_bytes=500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Hashing a big file still means reading it, so remember the hash until the file's size or mtime changes
+        self._hashes = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        # cache file -> size. Every hit touches the file (see _lookup), so the oldest modification time was used least recently
+        self._files = OrderedDict()
+        self._total = 0
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith('.pages'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, entry.path, stat.st_size))
+        for _, path, size in sorted(entries):
+            self._files[path] = size
+            self._total += size
+
+    def key(self, file_path):
+        stat = os.stat(file_path)
+        fingerprint = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        if fingerprint not in self._hashes:
+            sha = hashlib.sha256()
+            with open(file_path, 'rb') as file:
+                # Read in 1MB blocks so a huge file isn't loaded into memory at once
+                for block in iter(lambda: file.read(1024 * 1024), b''):
+                    sha.update(block)
+            self._hashes[fingerprint] = sha.hexdigest()
+        return f'{self._hashes[fingerprint]}-{PyPDF2.__version__}'
+
+    def _cache_path(self, file_path):
+        return os.path.join(self.cache_dir, self.key(file_path) + '.pages')
+
+    def _store(self, file_path, cache_path):
+        compressed_pages = [zlib.compress(text.encode('utf-8')) for text in iter_pdf_pages(file_path)]
+        offsets = []
+        end = 0
+        for data in compressed_pages:
+            end += len(data)
+            offsets.append(end)
+
+        # Write to a temporary file and rename it, so a crash never leaves half a cache file behind
+        temp_path = cache_path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(struct.pack('<I', len(compressed_pages)))
+            file.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+            file.writelines(compressed_pages)
+        os.replace(temp_path, cache_path)
+        self._evict(keep=cache_path)
+
+    def _evict(self, keep):
+        size = os.path.getsize(keep)
+        self._total += size - self._files.pop(keep, 0)
+        self._files[keep] = size
+        # Only when the total is over max_bytes: remove the least recently used files.
+        # The file that was just written is last and never removed, even if it is bigger than max_bytes on its own
+        while self._total > self.max_bytes and len(self._files) > 1:
+            path, size = self._files.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _lookup(self, file_path, force_refresh):
+        cache_path = self._cache_path(file_path)
+        if not force_refresh and os.path.exists(cache_path):
+            self.hits += 1
+            os.utime(cache_path)  # mark it as recently used, for the order after a restart
+            if cache_path in self._files:
+                self._files.move_to_end(cache_path)
+        else:
+            self.misses += 1
+            self._store(file_path, cache_path)
+        return cache_path
+
+    def page_count(self, file_path, force_refresh=False):
+        with open(self._lookup(file_path, force_refresh), 'rb') as file:
+            return struct.unpack('<I', file.read(4))[0]
+
+    def get_page(self, file_path, page_num, force_refresh=False):
+        with open(self._lookup(file_path, force_refresh), 'rb') as file:
+            num_pages = struct.unpack('<I', file.read(4))[0]
+            if not 0 <= page_num < num_pages:
+                raise IndexError(f'page {page_num} out of range, the document has {num_pages} pages')
+            data_start = 4 + 8 * num_pages
+            # Page n starts where page n - 1 ends, and the first page starts at 0
+            if page_num == 0:
+                start = 0
+                end = struct.unpack('<Q', file.read(8))[0]
+            else:
+                file.seek(4 + 8 * (page_num - 1))
+                start, end = struct.unpack('<2Q', file.read(16))
+            file.seek(data_start + start)
+            return zlib.decompress(file.read(end - start)).decode('utf-8')
+
+    def iter_pages(self, file_path, force_refresh=False):
+        with open(self._lookup(file_path, force_refresh), 'rb') as file:
+            num_pages = struct.unpack('<I', file.read(4))[0]
+            offsets = struct.unpack(f'<{num_pages}Q', file.read(8 * num_pages))
+            start = 0
+            for end in offsets:
+                yield zlib.decompress(file.read(end - start)).decode('utf-8')
+                start = end
+
+    # The same results as read_pdf and read_pdf_line_by_line above (lines split with splitlines() there too), but served from the cache
+    def read_pdf(self, file_path, force_refresh=False):
+        return ''.join(self.iter_pages(file_path, force_refresh))
+
+    def read_pdf_line_by_line(self, file_path, force_refresh=False):
+        lines = []
+        for page_text in self.iter_pages(file_path, force_refresh):
+            lines += page_text.splitlines()
+        return lines
+
+cache = PdfTextCache(max_bytes=100 * 1024 * 1024)
+
+text = cache.read_pdf('your_file.pdf')     # first time: the PDF is parsed and stored (a miss)
+text = cache.read_pdf('your_file.pdf')     # afterwards the PDF isn't opened at all (a hit)
+print(cache.get_page('your_file.pdf', 0))  # only the first page is decompressed
+print(f'hits: {cache.hits}, misses: {cache.misses}')
+
+# force_refresh=True ignores what is stored and extracts the text again, e.g. after changing how text is extracted
+text = cache.read_pdf('your_file.pdf', force_refresh=True)
+
+
+### Reading lines lazily
+
+# read_pdf_line_by_line extracts every page and builds one big list before you can use the first line.
+# PdfLines below behaves like that list (lines[i], lines[10:20], len(lines), for line in lines)
+# but a page is only extracted the first time one of its lines is needed.
+# It remembers how many lines the pages seen so far have (not the lines themselves),
+# and keeps just the last few pages it extracted in memory.
+
+import bisect
+from collections import OrderedDict
+
+class PdfLines:
+    def __init__(self, file_path, cached_pages=8):
+        self._file = open(file_path, 'rb')
+        self._pdf_reader = PyPDF2.PdfReader(self._file)
+        self._num_pages = len(self._pdf_reader.pages)
+        # _line_ends[n] is the total number of lines in pages 0 to n, e.g. [40, 75, 120]
+        self._line_ends = []
+        self._cached_pages = cached_pages
+        self._pages = OrderedDict()  # page number -> list of lines, in least recently used order
+
+    def _page_lines(self, page_num):
+        if page_num in self._pages:
+            self._pages.move_to_end(page_num)
+            return self._pages[page_num]
+
+        lines = self._pdf_reader.pages[page_num].extract_text().splitlines()
+        if page_num == len(self._line_ends):
+            previous_end = self._line_ends[-1] if self._line_ends else 0
+            self._line_ends.append(previous_end + len(lines))
+
+        self._pages[page_num] = lines
+        if len(self._pages) > self._cached_pages:
+            self._pages.popitem(last=False)
+        return lines
+
+    def _locate(self, index):
+        # Extract pages (in order) until we know which page the line is on
+        while len(self._line_ends) < self._num_pages and (not self._line_ends or self._line_ends[-1] <= index):
+            self._page_lines(len(self._line_ends))
+        # bisect finds the first page whose running total is bigger than index
+        page_num = bisect.bisect_right(self._line_ends, index)
+        if page_num == len(self._line_ends):
+            raise IndexError('line index out of range')
+        page_start = self._line_ends[page_num - 1] if page_num else 0
+        return page_num, index - page_start
+
+    def __len__(self):
+        # The number of lines is only known once every page has been counted
+        while len(self._line_ends) < self._num_pages:
+            self._page_lines(len(self._line_ends))
+        return self._line_ends[-1] if self._line_ends else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.start or 0, index.stop, index.step or 1
+            if start >= 0 and stop is not None and stop >= 0 and step > 0:
+                # A slice like lines[100:200] doesn't need the length of the whole document
+                result = []
+                for i in range(start, stop, step):
+                    try:
+                        result.append(self[i])
+                    except IndexError:
+                        break
+                return result
+            # Negative positions are counted from the end, so here we do need len()
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+            if index < 0:
+                raise IndexError('line index out of range')
+        page_num, line_num = self._locate(index)
+        return self._page_lines(page_num)[line_num]
+
+    def __iter__(self):
+        for page_num in range(self._num_pages):
+            yield from self._page_lines(page_num)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+with PdfLines('your_file.pdf') as lines:
+    print(lines[0])       # only the first page is extracted
+    print(lines[10:20])
+    print(len(lines))     # counts every page, but doesn't keep them
+    for line in lines:
+        print(line)
+
+
+### Memory used by both approaches
+
+# tracemalloc records the memory python allocates, get_traced_memory() returns (current, peak) in bytes.
+# make_test_pdf is the helper from the Performance section above
+
+import tracemalloc
+
+if __name__ == '__main__':
+    make_test_pdf('fixture_5000.pdf', 5000)
+
+    tracemalloc.start()
+    extracted_lines = read_pdf_line_by_line('fixture_5000.pdf')
+    print(extracted_lines[12345])
+    print(f"read_pdf_line_by_line peak: {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MB")
+    del extracted_lines
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    with PdfLines('fixture_5000.pdf') as lines:
+        print(lines[12345])
+        print(len(lines))
+    print(f"PdfLines peak: {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MB")
+    tracemalloc.stop()
+
+# Note that PyPDF2 itself keeps the parsed page objects of the reader in memory,
+# so PdfLines saves the memory of the text, not of the PDF structure.
+
+
+### Extracting a whole folder of PDFs
+
+# When there are thousands of files, one process handling one file at a time wastes most of the machine.
+# extract_corpus hands whole files to a process pool and yields (path, page number, text) as soon as a file is done.
+# Only a few files per worker are submitted at a time, so memory stays the same whether there are 10 or 100,000 paths
+# (paths can be a generator such as pathlib.Path('pdfs').rglob('*.pdf'), it is only read as work is needed).
+
+# A broken or encrypted file shouldn't stop the whole batch, so errors are recorded in the CorpusStats object
+# together with the numbers needed to see how fast things are going.
+
+import pathlib
+import statistics
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# reason is 'encrypted' or 'broken', error is the name of the exception and message its text
+ExtractionError = namedtuple('ExtractionError', ['path', 'reason', 'error', 'message'])
+
+class CorpusStats:
+    def __init__(self):
+        self.files = 0
+        self.pages = 0
+        self.latencies = []  # seconds spent extracting each file
+        self.errors = []
+        self.start_time = time.perf_counter()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start_time
+        report = {
+            'files': self.files,
+            'pages': self.pages,
+            'errors': len(self.errors),
+            'files_per_second': self.files / elapsed,
+            'pages_per_second': self.pages / elapsed,
+        }
+        if len(self.latencies) >= 2:
+            # quantiles(n=100) returns the 99 cut points between percentiles, so p50 is at index 49
+            percentiles = statistics.quantiles(self.latencies, n=100)
+            report.update(p50=percentiles[49], p95=percentiles[94], p99=percentiles[98])
+        return report
+
+def _extract_file(file_path):
+    # This runs inside a worker process, so exceptions are turned into values instead of being raised
+    start_time = time.perf_counter()
+    try:
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            if pdf_reader.is_encrypted:
+                return file_path, None, ExtractionError(file_path, 'encrypted', None, 'the file is password protected'), 0
+            pages = [page.extract_text() for page in pdf_reader.pages]
+    except Exception as err:
+        return file_path, None, ExtractionError(file_path, 'broken', type(err).__name__, str(err)), 0
+    return file_path, pages, None, time.perf_counter() - start_time
+
+def extract_corpus(paths, workers=4, stats=None, max_in_flight=None):
+    stats = stats if stats is not None else CorpusStats()
+    max_in_flight = max_in_flight or workers * 2
+    paths = iter(paths)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        while True:
+            # Top up the pool until max_in_flight files are being worked on (or we run out of paths)
+            for file_path in paths:
+                pending.add(executor.submit(_extract_file, str(file_path)))
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path, pages, error, latency = future.result()
+                if error:
+                    stats.errors.append(error)
+                    continue
+                stats.files += 1
+                stats.pages += len(pages)
+                stats.latencies.append(latency)
+                for page_num, text in enumerate(pages):
+                    yield file_path, page_num, text
+
+if __name__ == '__main__':
+    stats = CorpusStats()
+    for file_path, page_num, text in extract_corpus(pathlib.Path('pdfs').rglob('*.pdf'), workers=8, stats=stats):
+        print(file_path, page_num, len(text))
+
+    print(stats.report())
+    # {'files': 120, 'pages': 5400, 'errors': 2, 'files_per_second': ..., 'pages_per_second': ..., 'p50': ..., 'p95': ..., 'p99': ...}
+    for error in stats.errors:
+        print(f'skipped {error.path}: {error.reason} ({error.message})')
@@ -90,29 +90,29 @@ workbook.save('formulas_output.xlsx')
 
 # 1. Use the following Python script to convert an Excel file to CSV:
 
-   import openpyxl
-   import csv
+import openpyxl
+import csv
+
+def excel_to_csv(input_excel_file, output_csv_file):
+    # Load the Excel workbook
+    workbook = openpyxl.load_workbook(input_excel_file)
 
-   def excel_to_csv(input_excel_file, output_csv_file):
-       # Load the Excel workbook
-       workbook = openpyxl.load_workbook(input_excel_file)
+    # Choose the active sheet or specify the sheet name if needed
+    sheet = workbook.active
 
-       # Choose the active sheet or specify the sheet name if needed
-       sheet = workbook.active
+    # Open a CSV file for writing
+    with open(output_csv_file, 'w', newline='') as csv_file:
+        csv_writer = csv.writer(csv_file)
 
-       # Open a CSV file for writing
-       with open(output_csv_file, 'w', newline='') as csv_file:
-           csv_writer = csv.writer(csv_file)
+        # Iterate through rows in the sheet and write to CSV
+        for row in sheet.iter_rows(values_only=True):
+            csv_writer.writerow(row)
 
-           # Iterate through rows in the sheet and write to CSV
-           for row in sheet.iter_rows(values_only=True):
-               csv_writer.writerow(row)
+# Example usage
+input_excel_file = 'input.xlsx'
+output_csv_file = 'output.csv'
+excel_to_csv(input_excel_file, output_csv_file)
 
-   # Example usage
-   input_excel_file = 'input.xlsx'
-   output_csv_file = 'output.csv'
-   excel_to_csv(input_excel_file, output_csv_file)
-   
 
 # Replace `'input.xlsx'` with the path to your Excel file and `'output.csv'` with the desired path for the CSV output file.
 # This script uses the `openpyxl` library to load the Excel workbook, accesses the active sheet, and iterates through the rows to write them to a CSV file using the `csv` module.
@@ -123,3 +123,572 @@ workbook.save('formulas_output.xlsx')
 
 # These examples cover some of the basic operations with `openpyxl`.
 # For more detailed information, refer to the official `openpyxl` documentation: [openpyxl Documentation](https://openpyxl.readthedocs.io/).
+
+
+### Converting big Excel files to CSV without running out of memory
+
+# load_workbook() in the default mode reads every cell of every sheet into Cell objects (with their styles) before you can use any of them.
+# For a file with hundreds of thousands of rows that takes gigabytes of memory.
+# With read_only=True openpyxl reads the sheet xml as you iterate, so only the current row is in memory.
+# values_only=True then skips creating cell objects and gives plain tuples of values.
+
+# The function below converts every sheet (not just workbook.active) to its own CSV file, named after the sheet.
+# Rows are collected into batches and written with writerows(), and the file gets a 1MB buffer, so there are few small writes.
+
+import csv
+import os
+import openpyxl
+
+def _write_sheet_csv(sheet, output_csv_file, batch_size):
+    rows = 0
+    with open(output_csv_file, 'w', newline='', buffering=1024 * 1024) as csv_file:
+        csv_writer = csv.writer(csv_file)
+        batch = []
+        for row in sheet.iter_rows(values_only=True):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                csv_writer.writerows(batch)
+                rows += len(batch)
+                batch.clear()
+        csv_writer.writerows(batch)
+        rows += len(batch)
+    return rows
+
+def excel_to_csv_streaming(input_excel_file, output_folder, batch_size=10000):
+    os.makedirs(output_folder, exist_ok=True)
+    # Like excel_to_csv above this writes formulas as text ('=A1 + B1'),
+    # pass data_only=True to get the values Excel calculated when the file was last saved instead
+    workbook = openpyxl.load_workbook(input_excel_file, read_only=True)
+    rows_per_sheet = {}
+    try:
+        for sheet in workbook.worksheets:
+            output_csv_file = os.path.join(output_folder, f'{sheet.title}.csv')
+            rows_per_sheet[sheet.title] = _write_sheet_csv(sheet, output_csv_file, batch_size)
+    finally:
+        # A read-only workbook keeps the file open until it is closed
+        workbook.close()
+    return rows_per_sheet
+
+print(excel_to_csv_streaming('input.xlsx', 'csv_output'))  # {'Sheet1': 500000, 'Sheet2': 1200}
+
+
+### Performance
+
+# ru_maxrss is the most memory the process has used so far (in KB on Linux), it never goes down.
+# So each conversion runs in a new process, otherwise the second one would report the peak of the first.
+
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+def make_large_workbook(file_path, num_rows, num_columns=10):
+    # write_only=True streams the rows to the file as they are appended, so even making the test file doesn't need much memory
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Data')
+    sheet.append([f'Column{column}' for column in range(num_columns)])
+    for row_num in range(num_rows):
+        sheet.append([row_num, f'name {row_num}', row_num * 1.5] + [row_num % 97] * (num_columns - 3))
+    workbook.save(file_path)
+
+def _measure(func, *args):
+    start_time = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start_time
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+if __name__ == '__main__':
+    num_rows = 500000
+    make_large_workbook('large.xlsx', num_rows)
+
+    for name, convert, output in [('excel_to_csv', excel_to_csv, 'large.csv'),
+                                  ('excel_to_csv_streaming', excel_to_csv_streaming, 'large_csv')]:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            elapsed, peak_mb = executor.submit(_measure, convert, 'large.xlsx', output).result()
+        print(f'{name}: {num_rows / elapsed:.0f} rows/second, peak memory {peak_mb:.0f} MB')
+    # excel_to_csv: 6123 rows/second, peak memory 1903 MB
+    # excel_to_csv_streaming: 8630 rows/second, peak memory 77 MB
+
+
+### Exporting every sheet in parallel
+
+# excel_to_csv_streaming still does one sheet after the other on a single core.
+# When a workbook has many big sheets, each sheet can be converted by its own worker process.
+# Every worker opens the file itself in read-only mode (an open workbook can't be sent to another process)
+# and only reads the sheet it was given. max_workers limits how many sheets are converted at the same time,
+# which matters because every worker also loads the workbook's shared strings table into memory.
+
+def _sheet_to_csv(input_excel_file, sheet_name, output_csv_file, batch_size):
+    # This runs inside a worker process
+    start_time = time.perf_counter()
+    workbook = openpyxl.load_workbook(input_excel_file, read_only=True)
+    try:
+        rows = _write_sheet_csv(workbook[sheet_name], output_csv_file, batch_size)
+    finally:
+        workbook.close()
+    return rows, time.perf_counter() - start_time
+
+def excel_to_csv_parallel(input_excel_file, output_folder, max_workers=4, batch_size=10000):
+    start_time = time.perf_counter()
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Opening in read-only mode only to get the sheet names is quick, the sheets themselves aren't read.
+    # workbook.sheetnames would include chart sheets too, they have no cells to export
+    workbook = openpyxl.load_workbook(input_excel_file, read_only=True)
+    sheet_names = [sheet.title for sheet in workbook.worksheets]
+    workbook.close()
+
+    summary = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(sheet_names)))) as executor:
+        futures = {sheet_name: executor.submit(_sheet_to_csv, input_excel_file, sheet_name,
+                                               os.path.join(output_folder, f'{sheet_name}.csv'), batch_size)
+                   for sheet_name in sheet_names}
+        for sheet_name, future in futures.items():
+            rows, elapsed = future.result()
+            summary[sheet_name] = {'rows': rows, 'seconds': elapsed}
+
+    print(f'{len(sheet_names)} sheets, {sum(sheet["rows"] for sheet in summary.values())} rows '
+          f'in {time.perf_counter() - start_time:.1f} seconds')
+    return summary
+
+# The pool starts new python processes that import this file, so it has to be behind the __main__ check
+if __name__ == '__main__':
+    summary = excel_to_csv_parallel('input.xlsx', 'csv_output', max_workers=4)
+    for sheet_name, result in summary.items():
+        print(f"{sheet_name}: {result['rows']} rows in {result['seconds']:.1f} seconds")
+
+
+### Writing big reports with write-only mode
+
+# Setting cells one by one (sheet['A1'] = 'Hello') on a normal Workbook keeps a Cell object for every cell until save() is called.
+# For a million rows that is slow and uses a lot of memory. A write-only workbook instead writes each row out as soon as it is appended,
+# but you can only add whole rows with sheet.append(), in order.
+
+# Styles work differently too: in write-only mode a styled cell has to be a WriteOnlyCell. Giving every such cell its own
+# Font(...) and Alignment(...) is slow, so the styles are registered once on the workbook as named styles
+# and each cell only refers to one by name (cell.style = 'header').
+
+import math
+import re
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle
+
+def _shared_styles():
+    # A NamedStyle belongs to the workbook it is added to, so every workbook gets new ones
+    return [
+        NamedStyle(name='header', font=Font(bold=True, color='FF0000'), alignment=Alignment(horizontal='center')),
+        NamedStyle(name='bold', font=Font(bold=True)),
+        NamedStyle(name='centered', alignment=Alignment(horizontal='center')),
+    ]
+
+def _styled_cell(sheet, value, style):
+    cell = WriteOnlyCell(sheet, value=value)
+    cell.style = style
+    return cell
+
+def write_rows_to_excel(output_file, rows, header=None, sheet_title='Sheet', column_styles=None):
+    # rows can be any iterable (a list, a generator, a csv reader ...), it is only read once from start to end.
+    # column_styles maps a column number (starting at 0) to one of the shared style names, e.g. {0: 'bold'}
+    workbook = openpyxl.Workbook(write_only=True)
+    for style in _shared_styles():
+        workbook.add_named_style(style)
+    sheet = workbook.create_sheet(sheet_title)
+
+    if header:
+        sheet.append([_styled_cell(sheet, value, 'header') for value in header])
+
+    num_rows = 0
+    if column_styles:
+        for row in rows:
+            row = list(row)
+            for column, style in column_styles.items():
+                if column < len(row):
+                    row[column] = _styled_cell(sheet, row[column], style)
+            sheet.append(row)
+            num_rows += 1
+    else:
+        # Without styles the plain values are appended, no cell objects are created at all
+        for row in rows:
+            sheet.append(row)
+            num_rows += 1
+
+    workbook.save(output_file)
+    return num_rows
+
+# int() and float() accept much more than numbers written the usual way: '007' -> 7 (a zip code or ID loses its zeros),
+# '1_000' -> 1000, ' 5 ' -> 5, and 'nan', 'inf' or '1e999' give floats Excel can't show. Only text matching this is converted
+NUMBER_PATTERN = re.compile(r'-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][+-]?[0-9]+)?')
+
+def _to_number(value):
+    # Everything in a CSV file is text, but numbers should be numbers in Excel
+    match = NUMBER_PATTERN.fullmatch(value)
+    if match is None:
+        return value
+    if match.group(1) is None and match.group(2) is None:
+        return int(value)
+    number = float(value)
+    return number if math.isfinite(number) else value
+
+def csv_to_excel(input_csv_file, output_file, has_header=True, convert_numbers=True, **options):
+    with open(input_csv_file, newline='') as csv_file:
+        csv_reader = csv.reader(csv_file)
+        header = next(csv_reader, None) if has_header else None
+        rows = ([_to_number(value) for value in row] for row in csv_reader) if convert_numbers else csv_reader
+        return write_rows_to_excel(output_file, rows, header=header, **options)
+
+rows = ((n, f'name {n}', n * 1.5) for n in range(1000000))  # a generator, so the rows are never all in memory
+write_rows_to_excel('report.xlsx', rows, header=['Id', 'Name', 'Score'], column_styles={0: 'bold'})
+
+csv_to_excel('output.csv', 'from_csv.xlsx')
+
+
+### Performance
+
+def _write_cell_by_cell(output_file, num_rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for row_num in range(1, num_rows + 1):
+        sheet.cell(row=row_num, column=1, value=row_num)
+        sheet.cell(row=row_num, column=2, value=f'name {row_num}')
+        sheet.cell(row=row_num, column=3, value=row_num * 1.5)
+        sheet.cell(row=row_num, column=1).font = Font(bold=True)
+    workbook.save(output_file)
+
+def _write_rows(output_file, num_rows):
+    rows = ((n, f'name {n}', n * 1.5) for n in range(num_rows))
+    write_rows_to_excel(output_file, rows, column_styles={0: 'bold'})
+
+if __name__ == '__main__':
+    num_rows = 200000
+    for name, write in [('cell by cell', _write_cell_by_cell), ('write_rows_to_excel', _write_rows)]:
+        # _measure from the "Converting big Excel files" section, each run gets a new process so the peak memory is its own
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            elapsed, peak_mb = executor.submit(_measure, write, 'bulk.xlsx', num_rows).result()
+        print(f'{name}: {num_rows / elapsed:.0f} rows/second, peak memory {peak_mb:.0f} MB')
+
+
+### Calculating formulas in Python
+
+# openpyxl only stores formulas ('=A1 + B1'), it never calculates them. Excel (or LibreOffice) does that when the file is opened.
+# FormulaSheet below calculates a small part of what Excel can do: numbers, cell references (A1, $A$1), + - * / ^ %,
+# brackets, and the functions SUM, MIN, MAX, AVERAGE and COUNT with ranges like B1:B10.
+
+# The formula text is split into tokens by openpyxl's own Tokenizer, then turned into nested python functions once,
+# so calculating a formula again later doesn't have to read the text again.
+
+# To avoid recalculating everything when one number changes, the sheet keeps a dependency graph:
+#   - precedents: for each formula, the cells it reads ('C1' reads {'A1', 'B1'})
+#   - dependents: the other direction, for each cell the formulas that read it ('A1' is read by {'C1'})
+# After a change only the formulas that depend on the changed cells (directly or through other formulas) are calculated,
+# in an order where every formula comes after the formulas it reads (a topological order).
+
+import operator
+from collections import deque
+from openpyxl.formula import Tokenizer
+from openpyxl.formula.tokenizer import Token, TokenizerError
+from openpyxl.utils.cell import get_column_letter, range_boundaries
+
+class FormulaError(str):
+    # Excel shows errors such as #DIV/0! as the value of the cell, so they are stored as (a special kind of) string
+    pass
+
+FUNCTIONS = {
+    'SUM': sum,
+    'MIN': lambda numbers: min(numbers, default=0),
+    'MAX': lambda numbers: max(numbers, default=0),
+    'AVERAGE': lambda numbers: sum(numbers) / len(numbers),  # no numbers gives #DIV/0!, like in Excel
+    'COUNT': len,
+}
+
+def _power(base, exponent):
+    # With whole numbers python's ** never overflows, 10 ** 1000 is a number with 1001 digits (and 9 ** 9 ** 9 takes forever),
+    # so it is calculated with floats like Excel does: too big raises OverflowError.
+    # A negative number to a broken power, (-8) ^ (1/3), gives a complex number in python, Excel gives #NUM!
+    result = float(base) ** exponent
+    if isinstance(result, complex):
+        raise ValueError(f'{base} ^ {exponent} is not a real number')
+    return result
+
+OPERATORS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv, '^': _power}
+PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 3}
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _number(value):
+    # What + - * / ^ and the functions accept: numbers, and empty cells as 0.
+    # Text can't be calculated with (not even '5'), python would do 'a' * 2 = 'aa' instead of an error.
+    # The TypeError becomes #VALUE! in FormulaSheet._calculate_cell
+    if value is None:
+        return 0
+    if not _is_number(value):
+        raise TypeError(f'not a number: {value!r}')
+    return value
+
+def _cells_in_range(reference):
+    min_col, min_row, max_col, max_row = range_boundaries(reference)
+    if min_row is None or min_col is None:
+        raise ValueError(f'whole rows or columns are not supported: {reference}')
+    return [f'{get_column_letter(col)}{row}' for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)]
+
+class _FormulaParser:
+    def __init__(self, formula):
+        self.formula = formula
+        self.tokens = [token for token in Tokenizer(formula).items if token.type != Token.WSPACE]
+        self.pos = 0
+        self.references = set()
+
+    def parse(self):
+        function = self.expression()
+        if self.pos != len(self.tokens):
+            raise ValueError(f'unexpected {self.tokens[self.pos].value!r} in {self.formula}')
+        return function
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError(f'formula ends too early: {self.formula}')
+        self.pos += 1
+        return token
+
+    def expression(self, min_precedence=1):
+        # Precedence climbing: keep combining with operators that bind at least as strongly as min_precedence
+        left = self.unary()
+        while True:
+            token = self.peek()
+            if token is None or token.type != Token.OP_IN or PRECEDENCE.get(token.value, 0) < min_precedence:
+                return left
+            if token.value not in OPERATORS:
+                raise ValueError(f'unsupported operator {token.value!r} in {self.formula}')
+            self.pos += 1
+            right = self.expression(PRECEDENCE[token.value] + 1)
+            left = lambda get, left=left, right=right, op=OPERATORS[token.value]: op(_number(left(get)), _number(right(get)))
+
+    def unary(self):
+        token = self.peek()
+        if token is not None and token.type == Token.OP_PRE:
+            self.pos += 1
+            operand = self.unary()
+            return (lambda get: -_number(operand(get))) if token.value == '-' else (lambda get: _number(operand(get)))
+        function = self.primary()
+        while self.peek() is not None and self.peek().type == Token.OP_POST:  # 50% is 0.5
+            self.pos += 1
+            function = lambda get, function=function: _number(function(get)) / 100
+        return function
+
+    def primary(self):
+        token = self.next()
+        if token.type == Token.OPERAND and token.subtype == Token.NUMBER:
+            number = float(token.value) if any(c in token.value for c in '.eE') else int(token.value)
+            return lambda get: number
+        if token.type == Token.OPERAND and token.subtype == Token.TEXT:
+            text = token.value[1:-1].replace('""', '"')
+            return lambda get: text
+        if token.type == Token.OPERAND and token.subtype == Token.RANGE:
+            cells = _cells_in_range(token.value)
+            if len(cells) != 1:
+                raise ValueError(f'a range can only be used inside a function: {token.value}')
+            cell = cells[0]
+            self.references.add(cell)
+            # Empty cells count as 0 in calculations
+            return lambda get: 0 if get(cell) is None else get(cell)
+        if token.type == Token.PAREN and token.subtype == Token.OPEN:
+            function = self.expression()
+            if self.next().type != Token.PAREN:
+                raise ValueError(f'missing ) in {self.formula}')
+            return function
+        if token.type == Token.FUNC and token.subtype == Token.OPEN:
+            return self.function_call(token.value[:-1].upper())
+        raise ValueError(f'unsupported {token.value!r} in {self.formula}')
+
+    def function_call(self, name):
+        if name not in FUNCTIONS:
+            raise ValueError(f'unsupported function {name} in {self.formula}')
+        ranges, expressions = [], []
+        while True:
+            token = self.peek()
+            following = self.tokens[self.pos + 1] if self.pos + 1 < len(self.tokens) else None
+            if token is not None and token.type == Token.FUNC and token.subtype == Token.CLOSE and not ranges and not expressions:
+                self.pos += 1  # a function without arguments, e.g. SUM()
+                break
+            if (token is not None and token.type == Token.OPERAND and token.subtype == Token.RANGE
+                    and following is not None and following.type in (Token.SEP, Token.FUNC)):
+                self.pos += 1
+                cells = _cells_in_range(token.value)
+                self.references.update(cells)
+                ranges.append(cells)
+            else:
+                expressions.append(self.expression())
+            token = self.next()
+            if token.type == Token.FUNC and token.subtype == Token.CLOSE:
+                break
+            if token.type != Token.SEP:
+                raise ValueError(f'unexpected {token.value!r} in {self.formula}')
+
+        function = FUNCTIONS[name]
+
+        def call(get):
+            # Like Excel, text and empty cells inside a range are skipped
+            numbers = [value for cells in ranges for value in map(get, cells) if _is_number(value)]
+            numbers.extend(_number(expression(get)) for expression in expressions)
+            return function(numbers)
+        return call
+
+class FormulaSheet:
+    def __init__(self):
+        self._values = {}
+        self._formulas = {}     # cell -> (formula text, compiled function)
+        self._precedents = {}   # formula cell -> set of cells it reads
+        self._dependents = {}   # cell -> set of formula cells that read it
+        self._dirty = set()     # cells changed since the last calculation
+
+    @staticmethod
+    def _key(cell):
+        return cell.replace('$', '').upper()
+
+    def __setitem__(self, cell, value):
+        cell = self._key(cell)
+        # Parse first: if the formula isn't supported (a ValueError) the cell keeps what it had
+        if isinstance(value, str) and value.startswith('='):
+            parser = _FormulaParser(value)
+            function = parser.parse()
+
+        if cell in self._formulas:
+            del self._formulas[cell]
+            for reference in self._precedents.pop(cell):
+                self._dependents[reference].discard(cell)
+
+        if isinstance(value, str) and value.startswith('='):
+            self._formulas[cell] = (value, function)
+            self._precedents[cell] = parser.references
+            for reference in parser.references:
+                self._dependents.setdefault(reference, set()).add(cell)
+        else:
+            self._values[cell] = value
+        # Nothing is calculated yet, so setting many cells in a row only calculates once when a value is read
+        self._dirty.add(cell)
+
+    def __getitem__(self, cell):
+        if self._dirty:
+            self.recalculate()
+        return self._values.get(self._key(cell))
+
+    def formula(self, cell):
+        formula = self._formulas.get(self._key(cell))
+        return formula[0] if formula else None
+
+    def recalculate(self):
+        # Find every formula that depends on a changed cell, directly or through other formulas
+        affected = set()
+        stack = list(self._dirty)
+        while stack:
+            cell = stack.pop()
+            if cell not in affected:
+                affected.add(cell)
+                stack.extend(self._dependents.get(cell, ()))
+        self._dirty.clear()
+        return self._calculate(affected)
+
+    def recalculate_all(self):
+        self._dirty.clear()
+        return self._calculate(set(self._formulas))
+
+    def _calculate(self, cells):
+        # Kahn's algorithm: a cell is ready once none of the cells it reads still has to be calculated
+        waiting_for = dict.fromkeys(cells, 0)
+        for cell in cells:
+            for dependent in self._dependents.get(cell, ()):
+                if dependent in waiting_for:
+                    waiting_for[dependent] += 1
+        ready = deque(cell for cell, count in waiting_for.items() if count == 0)
+
+        calculated = 0
+        while ready:
+            cell = ready.popleft()
+            del waiting_for[cell]
+            if cell in self._formulas:
+                self._values[cell] = self._calculate_cell(cell)
+                calculated += 1
+            for dependent in self._dependents.get(cell, ()):
+                if dependent in waiting_for:
+                    waiting_for[dependent] -= 1
+                    if waiting_for[dependent] == 0:
+                        ready.append(dependent)
+
+        # Whatever is left is part of (or depends on) a circular reference such as A1 = B1 + 1, B1 = A1 + 1
+        for cell in waiting_for:
+            if cell in self._formulas:
+                self._values[cell] = FormulaError('#CIRCULAR!')
+        return calculated
+
+    def _calculate_cell(self, cell):
+        # An error in a cell that is read becomes the result of this cell too
+        for reference in self._precedents[cell]:
+            if isinstance(self._values.get(reference), FormulaError):
+                return self._values[reference]
+        try:
+            return self._formulas[cell][1](self._values.get)
+        except ZeroDivisionError:
+            return FormulaError('#DIV/0!')
+        except TypeError:
+            return FormulaError('#VALUE!')  # e.g. adding a number and text
+        except (OverflowError, ValueError):
+            return FormulaError('#NUM!')    # e.g. 10^1000 or (-8)^(1/3)
+
+    @classmethod
+    def from_worksheet(cls, sheet):
+        formula_sheet = cls()
+        for row in sheet.iter_rows():
+            for cell in row:
+                if cell.value is None:
+                    continue
+                try:
+                    formula_sheet[cell.coordinate] = cell.value
+                except (ValueError, TokenizerError):
+                    # A formula FormulaSheet can't calculate (IF, &, =A1=1 ...) gets Excel's error for an unknown name,
+                    # instead of stopping the whole sheet from loading
+                    formula_sheet[cell.coordinate] = FormulaError('#NAME?')
+        return formula_sheet
+
+# The same cells as in the "Handling Formulas" example
+formula_sheet = FormulaSheet()
+formula_sheet['A1'] = 10
+formula_sheet['B1'] = 20
+formula_sheet['C1'] = '=A1 + B1'
+print(formula_sheet['C1'])  # 30
+
+formula_sheet['A1'] = 15    # only C1 is calculated again
+print(formula_sheet['C1'])  # 35
+
+# It also works on a sheet loaded with openpyxl
+formula_sheet = FormulaSheet.from_worksheet(openpyxl.load_workbook('formulas_output.xlsx').active)
+print(formula_sheet['C1'])
+
+
+### Full vs incremental recalculation
+
+def make_formula_sheet(num_rows):
+    # Column B and C hold 2 formulas per row, and D1 adds up all of column C
+    formula_sheet = FormulaSheet()
+    for row in range(1, num_rows + 1):
+        formula_sheet[f'A{row}'] = row
+        formula_sheet[f'B{row}'] = f'=A{row} * 2 + 1'
+        formula_sheet[f'C{row}'] = f'=B{row} + A{row} / 2'
+    formula_sheet['D1'] = f'=SUM(C1:C{num_rows})'
+    return formula_sheet
+
+if __name__ == '__main__':
+    start_time = time.perf_counter()
+    formula_sheet = make_formula_sheet(50000)  # 100,001 formulas
+    print(f'Reading the formulas: {time.perf_counter() - start_time:.2f} seconds')
+
+    start_time = time.perf_counter()
+    calculated = formula_sheet.recalculate_all()
+    print(f'Full recalculation: {calculated} formulas in {time.perf_counter() - start_time:.3f} seconds')
+
+    start_time = time.perf_counter()
+    formula_sheet['A500'] = 7
+    print(formula_sheet['D1'])
+    print(f'Incremental recalculation after changing A500: {time.perf_counter() - start_time:.3f} seconds')  # only B500, C500 and D1
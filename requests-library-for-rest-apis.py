@@ -113,3 +113,904 @@ session.close()
 # This tutorial covers the basics of using the `requests` library for making HTTP requests in Python.
 # For more advanced features and options, refer to the official documentation: [Requests Documentation](https://docs.python-requests.org/en/master/).
 
+
+
+### Many requests at once with a connection pool
+
+# requests.get() opens a new connection (and for https does a new TLS handshake) for every call.
+# A Session keeps connections open and reuses them, but the requests above still run one after the other.
+# When polling hundreds of endpoints most of the time is spent waiting for the network, so it pays to send them from several threads.
+
+# PooledClient puts these together:
+#   - one Session shared by a pool of threads. Its HTTPAdapter keeps up to pool_maxsize open connections per host,
+#     set to the number of threads so no thread has to open a connection that is thrown away afterwards
+#   - a timeout for every request, (connect timeout, read timeout) in seconds. Without one a request can hang forever
+#   - retries with backoff for 5xx responses and connection errors: wait backoff_factor * 2 ** (retry number - 1) seconds
+#     before trying again (0.5s, 1s, 2s ...). Only GET, PUT, DELETE, HEAD and OPTIONS are retried by default,
+#     because repeating a POST could create something twice
+
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+class PooledClient:
+    def __init__(self, headers=None, max_workers=16, timeout=(3.05, 10), retries=3, backoff_factor=0.5, max_hosts=10):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+
+        # raise_on_status=False: when the retries are used up we get the last response back,
+        # and raise_for_status() can be used on it like in the "Handling Errors" section
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(500, 502, 503, 504), raise_on_status=False)
+        # pool_connections is how many hosts get their own pool, pool_maxsize how many connections each pool keeps
+        adapter = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=max_workers, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get_many(self, urls, **kwargs):
+        # The responses come back in the same order as the urls. A request that fails (e.g. a timeout)
+        # gives its exception in the list instead of stopping all the others
+        def fetch(url):
+            try:
+                return self.get(url, **kwargs)
+            except requests.exceptions.RequestException as err:
+                return err
+        return list(self.executor.map(fetch, urls))
+
+    def close(self):
+        self.executor.shutdown()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+with PooledClient(headers={'User-Agent': 'Your User Agent'}, max_workers=8) as client:
+    urls = [f"https://jsonplaceholder.typicode.com/posts/{n}" for n in range(1, 51)]
+    for url, response in zip(urls, client.get_many(urls)):
+        if isinstance(response, Exception):
+            print(f"{url} failed: {response}")
+        else:
+            print(url, response.status_code)
+
+
+### Trying it against a local server
+
+# To test the client without depending on a real API, python's http.server can act as a small local server in a thread.
+# protocol_version = 'HTTP/1.1' is needed for the connections to stay open between requests (HTTP/1.0 closes them every time).
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body are sent separately. On a connection that stays open, Nagle's algorithm would hold back
+    # the body until the client acknowledges the headers, which the client delays by up to 40ms
+    disable_nagle_algorithm = True
+    requests_seen = 0
+    flaky_failures = {}  # path -> how many times it has failed so far
+
+    def do_GET(self):
+        StandInHandler.requests_seen += 1
+        if self.path.startswith('/flaky'):
+            # Fails twice with 503 before it works, to see the retries happen
+            failures = StandInHandler.flaky_failures.get(self.path, 0)
+            if failures < 2:
+                StandInHandler.flaky_failures[self.path] = failures + 1
+                return self.send_body(503, b'{"error": "try again"}')
+        time.sleep(0.02)  # pretend the server needs some time to answer
+        self.send_body(200, b'{"path": "%s"}' % self.path.encode())
+
+    def send_body(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # don't print a line for every request
+
+class StandInServer(ThreadingHTTPServer):
+    # socketserver only lets 5 connections wait to be accepted, more than that and new ones are refused or delayed by seconds
+    request_queue_size = 1024
+    daemon_threads = True
+
+def start_stand_in_server():
+    # Port 0 lets the operating system pick a free port
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+server, base_url = start_stand_in_server()
+
+with PooledClient(max_workers=16, backoff_factor=0.01) as client:
+    response = client.get(base_url + '/flaky/1')
+    print(response.status_code, StandInHandler.requests_seen)  # 200 3 -> two 503s were retried
+
+    urls = [f'{base_url}/data/{n}' for n in range(200)]
+
+    start_time = time.perf_counter()
+    for url in urls:
+        requests.get(url, timeout=5)
+    print(f"requests.get one by one: {len(urls) / (time.perf_counter() - start_time):.0f} requests/second")
+
+    session = requests.Session()
+    start_time = time.perf_counter()
+    for url in urls:
+        session.get(url, timeout=5)
+    print(f"Session one by one: {len(urls) / (time.perf_counter() - start_time):.0f} requests/second")
+    session.close()
+
+    start_time = time.perf_counter()
+    responses = client.get_many(urls)
+    print(f"PooledClient with 16 threads: {len(urls) / (time.perf_counter() - start_time):.0f} requests/second")
+    print(all(response.json()['path'] == f'/data/{n}' for n, response in enumerate(responses)))  # True, same order as the urls
+
+server.shutdown()
+
+
+### Caching responses
+
+# Data that rarely changes doesn't have to be downloaded on every GET. HTTP has headers for this:
+#   - Cache-Control: max-age=60 in a response means it can be used for 60 seconds without asking the server again
+#     (no-cache means "always ask first", no-store means "don't keep it at all")
+#   - ETag (a version id of the data) and Last-Modified let us ask "has it changed?" by sending them back as
+#     If-None-Match / If-Modified-Since. If nothing changed the server answers 304 Not Modified with an empty body,
+#     and we use the body we already have. That is called revalidation.
+
+# CachingSession is a Session that does this for GET requests. Where the responses are kept is up to the store:
+# MemoryStore keeps them in a dict, DiskStore in files so they survive restarts. Both drop the least recently used
+# responses when they hold more than max_bytes (DiskStore lists its folder once at the start and then keeps count itself).
+# cache_stats counts hits (used without asking), revalidated (asked, got 304) and misses (downloaded).
+
+# A response can depend on request headers, the server lists those in Vary (e.g. Vary: Accept-Language).
+# The values of those headers are part of the key, so a German page is never given to someone asking for English.
+# Requests with credentials (an Authorization header or auth=) aren't cached at all: what one user is allowed to see
+# must never be handed to another one.
+
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+from requests.sessions import merge_setting
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+class MemoryStore:
+    def __init__(self, max_bytes=50 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key)['content'])
+            self._entries[key] = entry
+            self._size += len(entry['content'])
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, dropped = self._entries.popitem(last=False)
+                self._size -= len(dropped['content'])
+
+class DiskStore:
+    def __init__(self, cache_dir='.http_cache', max_bytes=500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        # path -> size, least recently used first. get() touches the file, so after a restart the modification times give the order
+        self._files = OrderedDict()
+        self._size = 0
+        entries = []
+        for dir_entry in os.scandir(cache_dir):
+            if dir_entry.name.endswith('.pickle'):
+                stat = dir_entry.stat()
+                entries.append((stat.st_mtime_ns, dir_entry.path, stat.st_size))
+        for _, path, size in sorted(entries):
+            self._files[path] = size
+            self._size += size
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest() + '.pickle')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as file:
+                entry = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        os.utime(self._path(key))  # mark it as recently used
+        with self._lock:
+            if self._path(key) in self._files:
+                self._files.move_to_end(self._path(key))
+        return entry
+
+    def set(self, key, entry):
+        path = self._path(key)
+        # Write to a temporary file and rename it, so another thread never reads half a file
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            pickle.dump(entry, file)
+        os.replace(temp_path, path)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self._size += size - self._files.pop(path, 0)
+            self._files[path] = size
+            # Only when over max_bytes: drop the least recently used files. The new one is last, so it is kept
+            removed = []
+            while self._size > self.max_bytes and len(self._files) > 1:
+                old_path, old_size = self._files.popitem(last=False)
+                self._size -= old_size
+                removed.append(old_path)
+        for old_path in removed:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+
+def _cache_control(headers):
+    # 'public, max-age=60' -> {'public': None, 'max-age': '60'}
+    directives = {}
+    for part in headers.get('Cache-Control', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+def _max_age(directives):
+    if 'no-cache' in directives:
+        return 0
+    try:
+        return int(directives.get('max-age') or 0)
+    except ValueError:
+        return 0
+
+class CachingSession(requests.Session):
+    def __init__(self, store=None):
+        super().__init__()
+        self.store = store if store is not None else MemoryStore()
+        self.cache_stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+        self._stats_lock = threading.Lock()
+        # url -> the header names in its Vary, learned from the responses (after a restart the first GET downloads again)
+        self._vary = {}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.cache_stats[name] += 1
+
+    def request(self, method, url, **kwargs):
+        # Only plain GETs are cached. With stream=True the body is read later by the caller, so there is nothing to store yet
+        if method.upper() != 'GET' or kwargs.get('stream'):
+            return super().request(method, url, **kwargs)
+
+        # The headers that will really be sent: the session's headers with the ones passed to this call
+        headers = merge_setting(kwargs.get('headers'), self.headers, dict_class=CaseInsensitiveDict)
+        if 'Authorization' in headers or kwargs.get('auth') or self.auth:
+            return super().request(method, url, **kwargs)
+
+        # The key is the full url including the query string built from params=, plus the headers named in Vary
+        full_url = requests.Request('GET', url, params=kwargs.get('params')).prepare().url
+        key = self._key(full_url, headers)
+        entry = self.store.get(key)
+
+        if entry is not None and time.time() - entry['stored_at'] < entry['max_age']:
+            self._count('hits')
+            return self._build_response(entry)
+
+        if entry is not None and (entry['etag'] or entry['last_modified']):
+            # Only for this request: the 200 that may come back is stored under the headers without these two
+            conditional_headers = dict(kwargs.pop('headers', None) or {})
+            if entry['etag']:
+                conditional_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                conditional_headers['If-Modified-Since'] = entry['last_modified']
+            response = super().request(method, url, headers=conditional_headers, **kwargs)
+            if response.status_code == 304:
+                self._count('revalidated')
+                # The 304 can come with a new max-age, the stored body is still good for that long
+                entry = dict(entry, stored_at=time.time(), max_age=_max_age(_cache_control(response.headers)))
+                self.store.set(key, entry)
+                return self._build_response(entry)
+        else:
+            response = super().request(method, url, **kwargs)
+
+        self._count('misses')
+        self._maybe_store(full_url, headers, response)
+        return response
+
+    def _key(self, full_url, headers):
+        return full_url + ''.join(f'\0{name}: {headers.get(name, "")}' for name in self._vary.get(full_url, ()))
+
+    def _maybe_store(self, full_url, headers, response):
+        directives = _cache_control(response.headers)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        max_age = _max_age(directives)
+        vary = sorted({name.strip().lower() for name in response.headers.get('Vary', '').split(',') if name.strip()})
+        # Without max-age or something to revalidate with, keeping the response wouldn't save a download.
+        # Vary: * means the response depends on more than the headers, so it can't be reused
+        if response.status_code != 200 or 'no-store' in directives or not (max_age or etag or last_modified) or '*' in vary:
+            return
+        self._vary[full_url] = vary
+        self.store.set(self._key(full_url, headers), {
+            'url': response.url,
+            'status_code': response.status_code,
+            'headers': dict(response.headers),
+            'content': response.content,
+            'stored_at': time.time(),
+            'max_age': max_age,
+            'etag': etag,
+            'last_modified': last_modified,
+        })
+
+    @staticmethod
+    def _build_response(entry):
+        response = requests.Response()
+        response.url = entry['url']
+        response.status_code = entry['status_code']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry['content']  # the body, normally read from the connection
+        return response
+
+session = CachingSession(store=DiskStore('.http_cache'))
+response = session.get("https://jsonplaceholder.typicode.com/posts/1")
+response = session.get("https://jsonplaceholder.typicode.com/posts/1")
+print(response.json(), session.cache_stats)
+
+
+# Checking it with a local server that counts how often it was asked
+
+class CacheTestHandler(StandInHandler):
+    def do_GET(self):
+        StandInHandler.requests_seen += 1
+        body = b'{"value": 42}'
+        etag = '"v1"'
+        if self.path == '/fresh':
+            headers = {'Cache-Control': 'max-age=60'}
+        elif self.path == '/vary':
+            headers = {'Cache-Control': 'max-age=60', 'Vary': 'Accept-Language'}
+            body = json.dumps({'value': 42, 'language': self.headers.get('Accept-Language')}).encode()
+        elif self.path == '/etag':
+            headers = {'Cache-Control': 'no-cache', 'ETag': etag}
+            if self.headers.get('If-None-Match') == etag:
+                return self.send_body(304, b'', headers)
+        else:
+            headers = {'Cache-Control': 'no-store'}
+        self.send_body(200, body, headers)
+
+    def send_body(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), CacheTestHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base_url = f'http://127.0.0.1:{server.server_address[1]}'
+StandInHandler.requests_seen = 0
+
+session = CachingSession(store=MemoryStore())
+for path in ('/fresh', '/etag', '/no-store'):
+    for _ in range(3):
+        assert session.get(base_url + path).json() == {'value': 42}
+
+# /fresh: 1 request (then 2 hits), /etag: 3 requests (1 miss + 2 revalidated 304s), /no-store: 3 requests (3 misses)
+print(StandInHandler.requests_seen, session.cache_stats)  # 7 {'hits': 2, 'revalidated': 2, 'misses': 5}
+
+# Every language is cached on its own, and with credentials the cache isn't used at all
+for language in ('en', 'de', 'en', 'de'):
+    assert session.get(base_url + '/vary', headers={'Accept-Language': language}).json()['language'] == language
+session.get(base_url + '/fresh', headers={'Authorization': 'Bearer token'})
+print(StandInHandler.requests_seen, session.cache_stats)  # 10 {'hits': 4, 'revalidated': 2, 'misses': 7}
+server.shutdown()
+
+
+### Reading a huge JSON array piece by piece
+
+# response.json() first downloads the whole body, then builds the whole python object. For a 200MB JSON array that means
+# the text and every element are in memory at the same time. When the body is a list of records we usually only
+# need one record at a time, so iter_json_array reads the body in chunks (stream=True + iter_content)
+# and yields each element of the array as soon as it has been fully received.
+
+# json.JSONDecoder().raw_decode(text, position) reads one JSON value starting at position and returns it with the position after it.
+# If the value isn't complete yet (it continues in the next chunk) it fails, and we wait for more data.
+# A number can also look complete when it isn't ('12' of '123', or '-1' of '-1.5'), so a value is only used
+# once the next character after it, the , or ] that has to follow every element, has arrived.
+
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r'\s*')
+_NUMBER_PART = re.compile(r'[0-9.eE+-]+')
+
+def iter_json_array(response, chunk_size=64 * 1024):
+    decoder = json.JSONDecoder()
+    # Decodes bytes to text even when a chunk ends in the middle of a multi-byte character
+    text_decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')()
+    buffer = ''
+    # What has to come next: '[' at the start, then a value or ']' (the array can be empty), after a ',' a value.
+    # The , or ] after an element is read together with the element, so [1,], [,1] and [1,,2] are errors like in json.loads
+    expecting = 'start'
+    finished = False
+
+    chunks = response.iter_content(chunk_size=chunk_size)
+    while not finished:
+        chunk = next(chunks, None)  # None means there is no more data
+        end_of_data = chunk is None
+        buffer += text_decoder.decode(chunk or b'', final=end_of_data)
+
+        position = 0
+        while not finished:
+            position = _WHITESPACE.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            if expecting == 'start':
+                if buffer[position] != '[':
+                    raise ValueError('the response is not a JSON array')
+                expecting = 'value or ]'
+                position += 1
+                continue
+            if expecting == 'value or ]' and buffer[position] == ']':
+                finished = True
+                position += 1
+                break
+            if buffer[position] in ',]':
+                raise ValueError(f'expected a value, found {buffer[position]!r}')
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if end_of_data:
+                    raise
+                break  # the element continues in the next chunk
+            after = _WHITESPACE.match(buffer, end).end()
+            if after == len(buffer):
+                if end_of_data:
+                    raise ValueError('the JSON array ended too early')
+                break
+            if buffer[after] not in ',]':
+                # '-1.' is read as -1 followed by '.', but with the next chunk it may become -1.5
+                if not end_of_data and after == end and _NUMBER_PART.fullmatch(buffer, end):
+                    break
+                raise ValueError(f'expected , or ] after an element, found {buffer[after]!r}')
+            yield element
+            finished = buffer[after] == ']'
+            expecting = 'value'
+            position = after + 1
+
+        # Throw away what has been used, so the buffer never holds more than about one element and one chunk
+        buffer = buffer[position:]
+        if end_of_data and not finished:
+            raise ValueError('the JSON array ended too early')
+
+    # Like json.loads, only whitespace may come after the array
+    while True:
+        if buffer.strip():
+            raise ValueError(f'extra data after the JSON array: {buffer.strip()[:20]!r}')
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        buffer = text_decoder.decode(chunk)
+
+# stream=True makes requests stop after the headers, the body is only read when iter_content is used
+with requests.get("https://jsonplaceholder.typicode.com/comments", stream=True) as response:
+    response.raise_for_status()
+    for comment in iter_json_array(response):
+        print(comment['id'], comment['email'])
+
+
+# Comparing with response.json() on a local server that sends a big generated array.
+# The server makes the array bit by bit while sending it, so it doesn't hold the whole array either.
+# It uses HTTP/1.0 without a Content-Length: the body simply ends when the server closes the connection.
+
+import tracemalloc
+
+class LargeArrayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.0'
+    num_elements = 200000
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'[')
+        for start in range(0, self.num_elements, 1000):
+            batch = (json.dumps({'id': n, 'name': f'item {n}', 'tags': ['a', 'b'], 'score': n / 7})
+                     for n in range(start, min(start + 1000, self.num_elements)))
+            self.wfile.write((',' if start else '').encode() + ','.join(batch).encode())
+        self.wfile.write(b']')
+
+    def log_message(self, format, *args):
+        pass
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), LargeArrayHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = f'http://127.0.0.1:{server.server_address[1]}/items'
+
+tracemalloc.start()
+start_time = time.perf_counter()
+total = sum(item['score'] for item in requests.get(url).json())
+elapsed = time.perf_counter() - start_time
+print(f"response.json(): {elapsed:.2f} seconds, peak memory {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MB")
+tracemalloc.stop()
+
+tracemalloc.start()
+start_time = time.perf_counter()
+with requests.get(url, stream=True) as response:
+    streamed_total = sum(item['score'] for item in iter_json_array(response))
+elapsed = time.perf_counter() - start_time
+print(f"iter_json_array: {elapsed:.2f} seconds, peak memory {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MB")
+tracemalloc.stop()
+
+print(total == streamed_total)  # True
+server.shutdown()
+
+
+### Staying under rate limits and sharing identical requests
+
+# Many APIs only allow a certain number of requests per second. A token bucket is a simple way to stay under that:
+# the bucket holds up to `burst` tokens and gets `rate` new tokens every second, every request takes one token,
+# and when the bucket is empty the request waits until a token has been added.
+# Here a request that finds the bucket empty takes a token "on credit" (the count goes below 0) and sleeps for as long as
+# it takes to pay it back, so requests that are waiting get their turn in the order they came.
+
+# When many threads ask for the same url at the same moment, only the first one has to send the request.
+# The others wait for its response (a Future is an object that will hold a result or an exception once it is ready).
+# That is called request coalescing. Only calls that would get the same answer are shared: the same url, params,
+# headers and allow_redirects. A GET with auth=, cookies=, verify=, cert= (or anything else besides those and timeout)
+# is always sent on its own.
+
+# RateLimitedSession does both. rate_limits sets (rate, burst) per host, default_limit is used for every other host.
+# limit_stats shows how long requests waited for a token in total and how many were coalesced into another request.
+
+import copy
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Returns how many seconds the caller had to wait
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)  # sleep outside the lock so other threads can queue up behind us
+        return wait
+
+class RateLimitedSession(requests.Session):
+    def __init__(self, rate_limits=None, default_limit=(10, 10)):
+        super().__init__()
+        self.rate_limits = rate_limits or {}
+        self.default_limit = default_limit
+        self.limit_stats = {'requests': 0, 'coalesced': 0, 'queued_seconds': 0.0, 'max_queued_seconds': 0.0}
+        self._buckets = {}
+        self._in_flight = {}  # request key -> Future of the request that is already running
+        self._lock = threading.Lock()
+
+    def _bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(*self.rate_limits.get(host, self.default_limit))
+            return self._buckets[host]
+
+    def request(self, method, url, **kwargs):
+        if (method.upper() != 'GET' or kwargs.get('stream')
+                or not kwargs.keys() <= {'params', 'headers', 'timeout', 'allow_redirects'}):
+            return self._limited_request(method, url, **kwargs)
+
+        # Identical means the same url (with params), the same extra headers and the same allow_redirects
+        # (session.get always passes allow_redirects=True)
+        headers = tuple(sorted((kwargs.get('headers') or {}).items()))
+        key = (requests.Request('GET', url, params=kwargs.get('params')).prepare().url, headers,
+               kwargs.get('allow_redirects', True))
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.limit_stats['coalesced'] += 1
+
+        if not is_leader:
+            return self._copy_response(future.result())
+
+        try:
+            response = self._limited_request(method, url, **kwargs)
+            future.set_result(response)
+            return self._copy_response(response)
+        except BaseException as err:
+            future.set_exception(err)  # the waiting callers get the same exception
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    @staticmethod
+    def _copy_response(response):
+        # Every caller (the first one too) gets its own copy, so one caller changing the response doesn't affect the others.
+        # copy.copy alone would still share the headers and cookies objects. The body is bytes, which can't be changed
+        response_copy = copy.copy(response)
+        response_copy.headers = response.headers.copy()
+        response_copy.cookies = response.cookies.copy()
+        response_copy.history = list(response.history)
+        return response_copy
+
+    def _limited_request(self, method, url, **kwargs):
+        waited = self._bucket(urlsplit(url).netloc).acquire()
+        with self._lock:
+            self.limit_stats['requests'] += 1
+            self.limit_stats['queued_seconds'] += waited
+            self.limit_stats['max_queued_seconds'] = max(self.limit_stats['max_queued_seconds'], waited)
+        return super().request(method, url, **kwargs)
+
+session = RateLimitedSession(rate_limits={'jsonplaceholder.typicode.com': (5, 10)})
+
+# The same local server as in "Trying it against a local server", it counts the requests it gets
+server, base_url = start_stand_in_server()
+StandInHandler.requests_seen = 0
+
+with ThreadPoolExecutor(max_workers=20) as executor:
+    # 20 threads ask for the same url at once: one request reaches the server
+    responses = list(executor.map(lambda _: session.get(base_url + '/popular'), range(20)))
+print(StandInHandler.requests_seen, session.limit_stats['coalesced'])  # 1 19 (can be a little different, depending on timing)
+
+session = RateLimitedSession(default_limit=(20, 5))  # 20 requests per second, at most 5 at once
+start_time = time.perf_counter()
+with ThreadPoolExecutor(max_workers=20) as executor:
+    list(executor.map(lambda n: session.get(f'{base_url}/item/{n}'), range(50)))
+# 5 requests straight away, the other 45 at 20 per second: about 2.25 seconds
+print(f"50 requests in {time.perf_counter() - start_time:.2f} seconds", session.limit_stats)
+
+server.shutdown()
+
+
+### An asyncio client using only the standard library
+
+# Everything above blocks: a thread waits while its request is on the network, so many requests at once need many threads.
+# With asyncio (see asynchronous-python-code.md) one thread can have thousands of requests waiting at the same time,
+# the same way asyncio.gather runs many tasks there. The requests library can't be awaited, so AsyncHTTPClient speaks
+# HTTP/1.1 itself over asyncio streams (asyncio.open_connection gives a reader and a writer for a TCP connection).
+
+#   - keep-alive: after a response has been read completely the connection is kept for the next request to the same host
+#   - max_connections_per_host limits the open connections to one host, max_concurrency the requests running at once
+#     (both are asyncio.Semaphore, a counter that makes coroutines wait when it reaches 0)
+#   - cancellation: cancelling a task (or the timeout running out) stops the request. A connection whose response was only
+#     half read can't be used again, so it is closed instead of being kept
+
+import asyncio
+import ssl as ssl_module
+
+# Requests that can be sent twice with the same effect as once (RFC 9110), so they may be retried on a new connection
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'}
+
+class AsyncResponse:
+    def __init__(self, url, status_code, reason, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers  # names in lower case
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            raise requests.exceptions.HTTPError(f'{self.status_code} {self.reason} for url: {self.url}')
+
+class AsyncHTTPClient:
+    # Create it inside a coroutine (e.g. in `async def main()`), the semaphores belong to the running event loop
+    def __init__(self, headers=None, max_concurrency=100, max_connections_per_host=20, timeout=10):
+        self.headers = {'User-Agent': 'python-asyncio', 'Accept-Encoding': 'identity', **(headers or {})}
+        self.timeout = timeout
+        self.max_connections_per_host = max_connections_per_host
+        self._concurrency = asyncio.Semaphore(max_concurrency)
+        self._host_limits = {}  # (scheme, host, port) -> Semaphore
+        self._idle = {}         # (scheme, host, port) -> list of open (reader, writer) pairs
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def request(self, method, url, headers=None, json=None, data=None):
+        # json= and data= work like in requests.post(url, json=...). The method is upper-cased once, like requests does,
+        # so request('head', url) doesn't wait for a body that never comes
+        async with self._concurrency:
+            # wait_for cancels the request when the timeout runs out
+            return await asyncio.wait_for(self._request(method.upper(), url, headers, json, data), self.timeout)
+
+    async def _request(self, method, url, headers, json_body, data):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        host_key = (parts.scheme, parts.hostname, port)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+        # Text is sent as UTF-8, bytes as they are
+        body = data.encode('utf-8') if isinstance(data, str) else data or b''
+        all_headers = {'Host': parts.netloc, **self.headers, **(headers or {})}
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            all_headers['Content-Type'] = 'application/json'
+        if body or method in ('POST', 'PUT', 'PATCH'):
+            all_headers['Content-Length'] = str(len(body))
+        request_bytes = (f'{method} {path} HTTP/1.1\r\n'
+                         + ''.join(f'{name}: {value}\r\n' for name, value in all_headers.items())
+                         + '\r\n').encode('latin-1') + body
+
+        if host_key not in self._host_limits:
+            self._host_limits[host_key] = asyncio.Semaphore(self.max_connections_per_host)
+        async with self._host_limits[host_key]:
+            idle = self._idle.setdefault(host_key, [])
+            for attempt in range(2):
+                reused = bool(idle) and attempt == 0
+                if reused:
+                    reader, writer = idle.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(
+                        parts.hostname, port, ssl=ssl_module.create_default_context() if parts.scheme == 'https' else None)
+                try:
+                    writer.write(request_bytes)
+                    await writer.drain()
+                    status_line = await reader.readline()
+                    if not status_line:
+                        raise ConnectionError(f'the server closed the connection without answering: {url}')
+                    status_code, reason, response_headers, content, keep_alive = await self._read_response(
+                        method, status_line, reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    # A kept connection may have been closed by the server in the meantime (ConnectionResetError,
+                    # BrokenPipeError or no answer at all). Then try once more on a new connection, but only when sending
+                    # the request twice does no harm: the server may have run a POST before the connection broke
+                    if reused and method in IDEMPOTENT_METHODS:
+                        continue
+                    raise
+                except BaseException:
+                    # Includes asyncio.CancelledError: the connection is in an unknown state, so it isn't kept
+                    writer.close()
+                    raise
+                if keep_alive:
+                    idle.append((reader, writer))
+                else:
+                    writer.close()
+                return AsyncResponse(url, status_code, reason, response_headers, content)
+
+    @staticmethod
+    async def _read_response(method, status_line, reader):
+        # 'HTTP/1.1 200 OK'
+        version, status, *reason = status_line.decode('latin-1').split(' ', 2)
+        status_code = int(status)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+        if method == 'HEAD' or status_code in (204, 304) or 100 <= status_code < 200:
+            content = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            # The body comes in pieces, each starting with its size in hex, and a piece of size 0 ends it
+            pieces = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass  # skip trailer headers
+                    break
+                pieces.append(await reader.readexactly(size))
+                await reader.readline()  # the \r\n after every piece
+            content = b''.join(pieces)
+        elif 'content-length' in headers:
+            content = await reader.readexactly(int(headers['content-length']))
+        else:
+            # No length given: the body ends when the server closes the connection
+            content = await reader.read()
+            keep_alive = False
+        return status_code, ' '.join(reason).strip(), headers, content, keep_alive
+
+    async def close(self):
+        for connections in self._idle.values():
+            for reader, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+async def main():
+    async with AsyncHTTPClient(headers={'User-Agent': 'Your User Agent'}) as client:
+        response = await client.get("https://jsonplaceholder.typicode.com/posts/1")
+        response.raise_for_status()
+        print(response.json())
+
+        response = await client.post("https://jsonplaceholder.typicode.com/posts", json={'key1': 'value1'})
+        print(response.status_code, response.json())  # 201
+
+        # Many GETs at once, like asyncio.gather of tasks in asynchronous-python-code.md
+        responses = await asyncio.gather(*(client.get(f"https://jsonplaceholder.typicode.com/posts/{n}") for n in range(1, 51)))
+        print([response.status_code for response in responses])
+
+        # Cancelling a request that takes too long
+        task = asyncio.create_task(client.get("https://jsonplaceholder.typicode.com/posts"))
+        await asyncio.sleep(0.001)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            print("cancelled")
+
+asyncio.run(main())
+
+
+# 1,000 requests at once against the local server: asyncio vs threads with requests.Session (PooledClient)
+
+async def fetch_all_async(urls, connections):
+    async with AsyncHTTPClient(max_concurrency=len(urls), max_connections_per_host=connections) as client:
+        return await asyncio.gather(*(client.get(url) for url in urls))
+
+server, base_url = start_stand_in_server()
+urls = [f'{base_url}/data/{n}' for n in range(1000)]
+
+start_time = time.perf_counter()
+responses = asyncio.run(fetch_all_async(urls, connections=100))
+print(f"AsyncHTTPClient, 100 connections: {len(urls) / (time.perf_counter() - start_time):.0f} requests/second")
+print(all(response.json()['path'] == f'/data/{n}' for n, response in enumerate(responses)))
+
+with PooledClient(max_workers=100) as client:
+    start_time = time.perf_counter()
+    responses = client.get_many(urls)
+    print(f"PooledClient, 100 threads: {len(urls) / (time.perf_counter() - start_time):.0f} requests/second")
+
+server.shutdown()